@@ -1,15 +1,28 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, date, timedelta # Added timedelta
+from calendar import month_name # 'calendar' itself is the streamlit_calendar component below
 from streamlit_calendar import calendar
 import re
 import json
 import os
+import hashlib
 
 st.set_page_config(layout="wide", page_title="Cohort & Unit Calendar")
 
 CONFIG_FILE = "config.json"
 MASTER_SCHEDULE_FILE = "master_schedule.csv"
+MASTER_SCHEDULE_PARQUET = "master_schedule.parquet" # Parsed copy of the CSV, rebuilt whenever the CSV is newer
+CATEGORY_COLUMNS = ['CohortName', 'UnitActivity', 'UnitActivityClean', 'UnitType'] # Low-cardinality text columns stored as category
+
+# Patterns used by the text parsers, compiled once at import
+ISO_DATE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})(?:[T ]|$)') # Already-normalized YYYY-MM-DD[ time] dates
+DATE_PREFIX_RE = re.compile(r'^\d{1,2}/\d{1,2}/\d{2,4}') # MM/DD/YY(YY) at the start of a pasted schedule line
+UNIT_NUMBER_RE = re.compile(r'\b(\d{3})\b') # 3-digit unit number inside a unit name, e.g. "FSDI 101"
+UNIT_LINE_RE = re.compile(r'^\d{3}\s') # teacher-assignment line starting with a unit number
+LEADING_NUMBER_RE = re.compile(r'^(\d+)')
+WHITESPACE_SPLIT_RE = re.compile(r'\s+|\t')
 
 # --- Configuration Management ---
 def load_config():
@@ -20,12 +33,26 @@ def load_config():
                 st.session_state.event_colors = config_data.get('event_colors', get_default_colors())
                 st.session_state.teacher_assignments = config_data.get('teacher_assignments', {})
                 st.session_state.all_known_teachers = set(config_data.get('all_known_teachers', []))
+                update_teacher_lookup(); update_known_teachers_sorted()
+                st.session_state.saved_config_hash = hash(serialize_config()) # What's on disk, as save_config would write it
                 return
         except Exception as e:
             st.error(f"Error loading {CONFIG_FILE}: {e}. Using defaults.")
     st.session_state.event_colors = get_default_colors()
     st.session_state.teacher_assignments = {}
     st.session_state.all_known_teachers = set()
+    update_teacher_lookup(); update_known_teachers_sorted()
+
+def update_teacher_lookup():
+    # Flat (cohort, unit) -> teacher view of teacher_assignments; rebuild whenever the assignments change
+    st.session_state.teacher_lookup = {
+        (cohort, unit): teacher
+        for cohort, units in st.session_state.teacher_assignments.items() for unit, teacher in units.items()
+    }
+
+def update_known_teachers_sorted():
+    # Sorted once per change of all_known_teachers, instead of on every rerun by the sidebar and save_config
+    st.session_state.all_known_teachers_sorted = tuple(sorted(st.session_state.all_known_teachers))
 
 def get_default_colors():
     return {
@@ -33,48 +60,114 @@ def get_default_colors():
         "ORIENTATION": "#d62728", "DEFAULT": "#7f7f7f"
     }
 
-def save_config():
+def serialize_config():
     config_data = {
         'event_colors': st.session_state.event_colors,
         'teacher_assignments': st.session_state.teacher_assignments,
-        'all_known_teachers': sorted(list(st.session_state.all_known_teachers))
+        'all_known_teachers': list(st.session_state.all_known_teachers_sorted)
     }
+    return json.dumps(config_data, indent=4)
+
+def save_config():
+    config_text = serialize_config()
+    config_hash = hash(config_text)
+    if config_hash == st.session_state.get('saved_config_hash'): return # Nothing changed since the last load/save
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config_data, f, indent=4)
+        # Write a temp file and swap it in, so a crash mid-write never leaves a truncated config.json behind
+        tmp_config_file = CONFIG_FILE + '.tmp'
+        with open(tmp_config_file, 'w') as f:
+            f.write(config_text)
+        os.replace(tmp_config_file, CONFIG_FILE)
+        st.session_state.saved_config_hash = config_hash
     except Exception as e:
         st.error(f"Error saving {CONFIG_FILE}: {e}")
 
 if 'event_colors' not in st.session_state:
     load_config()
+else:
+    if 'teacher_lookup' not in st.session_state: update_teacher_lookup()
+    if 'all_known_teachers_sorted' not in st.session_state: update_known_teachers_sorted()
 
 # --- Master Schedule Data Management ---
-@st.cache_data(ttl=300) # Cache for 5 minutes to allow updates after changes
-def load_master_schedule():
+def get_master_schedule_fingerprint():
+    # (mtime, size): cheap to stat, and an append within the mtime resolution still changes the size
+    if not os.path.exists(MASTER_SCHEDULE_FILE): return None
+    file_stat = os.stat(MASTER_SCHEDULE_FILE)
+    return file_stat.st_mtime, file_stat.st_size
+
+def read_master_schedule_parquet(csv_fingerprint):
+    # Only trust the Parquet copy if it was built from exactly this CSV: its recorded (mtime, size) must match.
+    # Comparing mtimes alone misses CSVs restored with an older mtime and rows appended by another session.
+    if csv_fingerprint is None or not os.path.exists(MASTER_SCHEDULE_PARQUET): return None
+    try:
+        df = pd.read_parquet(MASTER_SCHEDULE_PARQUET)
+    except (ImportError, OSError, ValueError): # No parquet engine or unreadable file: re-parse the CSV
+        return None
+    source_fingerprint = df.attrs.pop('source_fingerprint', None) # Stored by write_master_schedule_parquet
+    if source_fingerprint is None or tuple(source_fingerprint) != tuple(csv_fingerprint):
+        return None
+    if not all(col in df.columns for col in ['OriginalDateString', 'ParsedDate', '_ym', *CATEGORY_COLUMNS]):
+        return None # Written by an older version of the app
+    # Parquet hands missing strings back as None; keep them NaN like read_csv does
+    text_cols = ['OriginalDateString', 'CohortName', 'UnitActivity']
+    df[text_cols] = df[text_cols].where(df[text_cols].notna())
+    return df
+
+def write_master_schedule_parquet(df, csv_fingerprint):
+    # The CSV's (mtime, size) goes into the Parquet metadata (pandas keeps df.attrs there) for read_master_schedule_parquet
+    df.attrs['source_fingerprint'] = list(csv_fingerprint)
+    try:
+        df.to_parquet(MASTER_SCHEDULE_PARQUET)
+    except (ImportError, OSError, ValueError): pass # The CSV stays the source of truth; it is just parsed again next time
+    finally:
+        df.attrs.pop('source_fingerprint', None)
+
+def clean_master_schedule(df):
+    # Raw string rows (the whole CSV, or just newly appended rows) -> typed frame with the derived columns
+    # Vectorized parse (MM/DD/YYYY, then MM/DD/YY, then ISO for the leftovers) instead of strptime per row.
+    # Cohorts share most dates, so only the distinct strings are parsed and the result is mapped back.
+    date_strings = df['OriginalDateString'].str.strip()
+    unique_dates = pd.Series(date_strings.dropna().unique())
+    parsed = pd.to_datetime(unique_dates, format="%m/%d/%Y", errors='coerce')
+    unparsed = parsed.isna()
+    parsed.loc[unparsed] = pd.to_datetime(unique_dates[unparsed], format="%m/%d/%y", errors='coerce')
+    unparsed = parsed.isna()
+    if unparsed.any():
+        iso_dates = unique_dates[unparsed].str.extract(ISO_DATE_RE, expand=False)
+        parsed.loc[unparsed] = pd.to_datetime(iso_dates, format="%Y-%m-%d", errors='coerce')
+    df = df.assign(ParsedDate=date_strings.map(pd.Series(parsed.to_numpy(), index=unique_dates)))
+    df_cleaned = df.dropna(subset=['ParsedDate'])[['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate']].reset_index(drop=True)
+    # year*100 + month as one int32 column computed once, so the month filter is a single comparison
+    df_cleaned['_ym'] = df_cleaned['ParsedDate'].dt.year.astype('int32') * 100 + df_cleaned['ParsedDate'].dt.month.astype('int32')
+    # Blank units become '' and unit names are stripped here once, instead of astype(str)/replace('nan') on every rerun
+    df_cleaned['UnitActivity'] = df_cleaned['UnitActivity'].fillna('').str.strip()
+    # Display name and color type are fixed per unit, so they are worked out here rather than on every render
+    df_cleaned['UnitActivityClean'] = df_cleaned['UnitActivity'].replace('', "No Activity")
+    df_cleaned['UnitType'] = get_unit_types_for_color(df_cleaned['UnitActivity'])
+    # A few dozen cohorts/units repeat across thousands of rows: categories make isin() work on integer codes
+    df_cleaned[CATEGORY_COLUMNS] = df_cleaned[CATEGORY_COLUMNS].astype('category')
+    return df_cleaned
+
+@st.cache_data(show_spinner=False) # Keyed on the file's fingerprint, so reruns skip the CSV read until the file changes
+def load_master_schedule(file_fingerprint):
     if os.path.exists(MASTER_SCHEDULE_FILE):
         try:
+            df_parquet = read_master_schedule_parquet(file_fingerprint)
+            if df_parquet is not None: return df_parquet
+            csv_fingerprint = get_master_schedule_fingerprint() # Taken before reading: a change during the read makes the copy stale
             df = pd.read_csv(MASTER_SCHEDULE_FILE, dtype=str)
             if not all(col in df.columns for col in ['OriginalDateString', 'CohortName', 'UnitActivity']):
                  st.warning(f"{MASTER_SCHEDULE_FILE} is missing required columns.")
                  return pd.DataFrame(columns=['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate'])
             
-            df['ParsedDate_temp'] = df['OriginalDateString'].apply(parse_master_schedule_date_string)
-            df['ParsedDate'] = pd.to_datetime(df['ParsedDate_temp'], errors='coerce')
-            df_cleaned = df.dropna(subset=['ParsedDate'])
-            return df_cleaned[['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate']]
+            df_cleaned = clean_master_schedule(df)
+            write_master_schedule_parquet(df_cleaned, csv_fingerprint)
+            return df_cleaned
         except Exception as e:
             st.error(f"Error loading {MASTER_SCHEDULE_FILE}: {e}")
             return pd.DataFrame(columns=['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate'])
     return pd.DataFrame(columns=['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate'])
 
-def parse_master_schedule_date_string(date_str):
-    if pd.isna(date_str) or not str(date_str).strip(): return None
-    date_str_clean = str(date_str).strip()
-    try: return datetime.strptime(date_str_clean, "%m/%d/%Y").date()
-    except ValueError:
-        try: return datetime.strptime(date_str_clean, "%m/%d/%y").date()
-        except ValueError: return None
-
 def append_to_master_schedule(new_data_df):
     if new_data_df.empty: return
     try:
@@ -82,26 +175,41 @@ def append_to_master_schedule(new_data_df):
         if not all(col in new_data_df.columns for col in expected_cols):
             st.error("New data missing required columns.")
             return False
+        new_rows = new_data_df[expected_cols].astype(str)
+        append_rows = False
         if os.path.exists(MASTER_SCHEDULE_FILE):
             try:
-                master_df = pd.read_csv(MASTER_SCHEDULE_FILE, dtype=str)
-                if not all(col in master_df.columns for col in expected_cols):
+                # Only the header is read: new rows are appended rather than rewriting the whole file
+                master_cols = list(pd.read_csv(MASTER_SCHEDULE_FILE, dtype=str, nrows=0).columns)
+                if not all(col in master_cols for col in expected_cols):
                     st.warning(f"{MASTER_SCHEDULE_FILE} malformed. Overwriting.")
-                    updated_df = new_data_df.copy()
                 else:
-                    updated_df = pd.concat([master_df, new_data_df], ignore_index=True)
+                    new_rows = new_rows.reindex(columns=master_cols) # Match the file's column order
+                    append_rows = True
             except pd.errors.EmptyDataError:
-                updated_df = new_data_df.copy()
+                pass
             except Exception as e_read:
                 st.error(f"Read error for {MASTER_SCHEDULE_FILE}: {e_read}. Overwriting.")
-                updated_df = new_data_df.copy()
+
+        if append_rows:
+            # The Parquet copy can only be extended if it matches the CSV right before this append
+            fingerprint_before = get_master_schedule_fingerprint()
+            cached_df = read_master_schedule_parquet(fingerprint_before)
+            with open(MASTER_SCHEDULE_FILE, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                missing_newline = f.read(1) not in (b'\n', b'\r')
+            with open(MASTER_SCHEDULE_FILE, 'a', newline='') as f:
+                appended_text = ('\n' if missing_newline else '') + new_rows.to_csv(header=False, index=False) # Hand-edited files may not end with a newline
+                f.write(appended_text)
+                appended_bytes = len(appended_text.encode(f.encoding))
+            fingerprint_after = get_master_schedule_fingerprint()
+            # If another session appended in between, the size won't add up; leave the copy stale so the next load re-parses the CSV
+            if cached_df is not None and fingerprint_after[1] == fingerprint_before[1] + appended_bytes:
+                # Parse only the new rows and extend the Parquet copy, so the next load skips the CSV
+                extended_df = pd.concat([cached_df, clean_master_schedule(new_rows)], ignore_index=True)
+                write_master_schedule_parquet(extended_df.astype(dict.fromkeys(CATEGORY_COLUMNS, 'category')), fingerprint_after)
         else:
-            updated_df = new_data_df.copy()
-        
-        for col in expected_cols:
-            if col in updated_df: updated_df[col] = updated_df[col].astype(str)
-        updated_df.to_csv(MASTER_SCHEDULE_FILE, index=False)
-        st.cache_data.clear() # Clear cache for load_master_schedule
+            new_rows.to_csv(MASTER_SCHEDULE_FILE, index=False)
         return True
     except Exception as e:
         st.error(f"Append error {MASTER_SCHEDULE_FILE}: {e}")
@@ -114,98 +222,112 @@ def parse_new_cohort_schedule_input(raw_text_input):
     if not cohort_name:
         st.error("First line must be Cohort Name.")
         return pd.DataFrame()
-    schedule_entries = []
-    for line in lines[1:]:
-        parts = line.strip().split('\t')
-        date_str, unit_activity = None, ""
-        if len(parts) == 3: date_str, unit_activity = parts[1].strip(), parts[2].strip()
-        elif len(parts) == 2 and re.match(r'\d{1,2}/\d{1,2}/\d{2,4}', parts[0].strip()): # More flexible date match
-             date_str, unit_activity = parts[0].strip(), parts[1].strip()
-        
-        if date_str:
-            schedule_entries.append({
-                'OriginalDateString': date_str, 'CohortName': cohort_name,
-                'UnitActivity': unit_activity if unit_activity else ""
-            })
-    return pd.DataFrame(schedule_entries)
-
-def get_actual_unit_from_cell(cell_value):
-    if pd.isna(cell_value): return None
-    cell_value_str = str(cell_value).strip()
-    if not cell_value_str or cell_value_str.lower() in ["orientation", 'nan']: return None
-    match = re.search(r'\b(\d{3})\b', cell_value_str)
-    return match.group(1) if match else cell_value_str
-
-def get_unit_type_for_color(unit_name_full):
-    if pd.isna(unit_name_full) or not unit_name_full: return "DEFAULT"
-    uname = str(unit_name_full).upper()
-    if "FSDI" in uname: return "FSDI"
-    if "MDI1" in uname or "MDI-1" in uname: return "MDI1"
-    if "MDI2" in uname or "MDI-2" in uname: return "MDI2"
-    if "ORIENTATION" in uname: return "ORIENTATION"
-    return "DEFAULT"
+    # Split every pasted line at once; lines have either Day<Tab>Date<Tab>Unit or Date<Tab>Unit
+    body = pd.Series(lines[1:], dtype=object).str.strip()
+    if body.empty: return pd.DataFrame()
+    parts = body.str.split('\t', expand=True).reindex(columns=range(3)).fillna("")
+    n_parts = body.str.count('\t') + 1
+    has_day = n_parts == 3
+    starts_with_date = (n_parts == 2) & parts[0].str.strip().str.match(DATE_PREFIX_RE)
+    date_strs = parts[1].where(has_day, parts[0].where(starts_with_date, "")).str.strip()
+    unit_activities = parts[2].where(has_day, parts[1].where(starts_with_date, "")).str.strip()
+    keep = date_strs != ""
+    if not keep.any(): return pd.DataFrame()
+    return pd.DataFrame({
+        'OriginalDateString': date_strs[keep], 'CohortName': cohort_name, 'UnitActivity': unit_activities[keep]
+    }).reset_index(drop=True)
+
+def get_actual_units_from_cells(unit_names):
+    # Vectorized unit key: the 3-digit unit number if there is one, else the whole name; None for blanks and orientation
+    names = pd.Series(unit_names, dtype=object).fillna('').astype(str).str.strip()
+    unit_keys = names.str.extract(UNIT_NUMBER_RE, expand=False).fillna(names)
+    return unit_keys.where((names != '') & ~names.str.lower().isin(["orientation", "nan"]), None)
+
+def get_unit_types_for_color(unit_names):
+    # Vectorized FSDI/MDI1/MDI2/ORIENTATION/DEFAULT classification; earlier conditions win, like the old if-chain
+    upper_names = pd.Series(unit_names, dtype=object).fillna('').astype(str).str.upper()
+    conditions = [
+        upper_names.str.contains("FSDI", regex=False),
+        upper_names.str.contains("MDI1|MDI-1"),
+        upper_names.str.contains("MDI2|MDI-2"),
+        upper_names.str.contains("ORIENTATION", regex=False),
+    ]
+    return np.select(conditions, ["FSDI", "MDI1", "MDI2", "ORIENTATION"], default="DEFAULT")
 
 def parse_teacher_assignment_data(raw_data):
     assignments = {}; current_cohort = None; teachers_found = set()
     for line in raw_data.splitlines():
         line = line.strip()
         if not line: continue
-        if (line.upper().startswith("COHORT ") or "CH " in line.upper() or "CH." in line.upper()) and "\t" not in line and not re.match(r"^\d{3}\s", line): # Added CH.
+        if (line.upper().startswith("COHORT ") or "CH " in line.upper() or "CH." in line.upper()) and "\t" not in line and not UNIT_LINE_RE.match(line): # Added CH.
             current_cohort = line; assignments[current_cohort] = {}
         elif current_cohort and ("\t" in line or len(line.split()) >= 2):
-            parts = re.split(r'\s+|\t', line, 1)
+            parts = WHITESPACE_SPLIT_RE.split(line, maxsplit=1)
             if len(parts) == 2:
                 unit, teacher = parts[0].strip(), parts[1].strip()
                 if unit and teacher:
-                    unit_key = re.match(r'(\d+)', unit).group(1) if re.match(r'(\d+)', unit) else unit
+                    number_match = LEADING_NUMBER_RE.match(unit)
+                    unit_key = number_match.group(1) if number_match else unit
                     assignments[current_cohort][unit_key] = teacher; teachers_found.add(teacher)
     return assignments, teachers_found
 
-def generate_calendar_events_from_master(df_master, selected_cohorts, selected_units_full, selected_teachers, selected_year, selected_month):
+def apply_unit_and_teacher_filters(df_sub, selected_units_full, selected_teachers):
+    # Shared by the calendar and table views: returns the kept rows with UnitDisplay and Teacher columns added
+    if selected_units_full:
+        # Decide once per distinct unit name, then filter rows on the categorical codes
+        selected_units_set = set(selected_units_full)
+        unit_categories = df_sub['UnitActivityClean'].cat.categories
+        is_orientation = unit_categories.str.lower() == "orientation"
+        wanted = unit_categories.isin(selected_units_set) | (is_orientation & ("Orientation" in selected_units_set))
+        df_sub = df_sub[df_sub['UnitActivityClean'].isin(unit_categories[wanted])]
+    unit_display = df_sub['UnitActivityClean'].astype(str)
+
+    # Unit keys only depend on the unit text, so they are worked out once per distinct unit
+    distinct_units = unit_display.unique()
+    unit_keys = unit_display.map(dict(zip(distinct_units, get_actual_units_from_cells(distinct_units))))
+    teacher_lookup = st.session_state.teacher_lookup
+    teachers = pd.Series(
+        [teacher_lookup.get(key, "") for key in zip(df_sub['CohortName'], unit_keys)], index=df_sub.index, dtype=object
+    )
+    df_sub = df_sub.assign(UnitDisplay=unit_display, Teacher=teachers)
+    if selected_teachers:
+        df_sub = df_sub[teachers.isin(selected_teachers) | ((teachers == "") & ("Unassigned" in selected_teachers))]
+    return df_sub
+
+def generate_calendar_events_from_master(df_master, selected_cohorts, selected_units_full, selected_teachers, selected_year, selected_month, month_rows=None):
     events = []
     if df_master is None or df_master.empty: return events
     if 'ParsedDate' not in df_master.columns or not pd.api.types.is_datetime64_any_dtype(df_master['ParsedDate']):
         st.error("ParsedDate column issue in master data for calendar.")
         return events
-    try:
-        df_month_year_filtered = df_master[
-            (df_master['ParsedDate'].dt.year == selected_year) &
-            (df_master['ParsedDate'].dt.month == selected_month)
-        ]
-    except AttributeError: st.error("Error accessing .dt on ParsedDate for calendar."); return events
+    target_ym = selected_year * 100 + selected_month
+    if month_rows is not None: # Row positions from get_month_row_index for this same df_master
+        df_month_year_filtered = df_master.take(month_rows.get(target_ym, []))
+    else:
+        df_month_year_filtered = df_master[df_master['_ym'] == target_ym]
     if df_month_year_filtered.empty: return events
     df_month = df_month_year_filtered[df_month_year_filtered['CohortName'].isin(selected_cohorts)]
     if df_month.empty: return events
         
-    for index, row in df_month.iterrows():
-        event_py_datetime_obj = row['ParsedDate']
-        event_py_date_obj = event_py_datetime_obj.date()
-        cohort_name = row['CohortName']; unit_activity_full = str(row['UnitActivity']).strip()
-        actual_unit_activity_display = unit_activity_full if unit_activity_full else "No Activity"
-
-        display_event = False
-        if not selected_units_full: display_event = True
-        elif actual_unit_activity_display.lower() == "orientation" and "Orientation" in selected_units_full: display_event = True
-        elif actual_unit_activity_display in selected_units_full: display_event = True
-        if not display_event: continue
-
-        teacher_name = ""
-        unit_key_teacher = get_actual_unit_from_cell(actual_unit_activity_display)
-        if cohort_name in st.session_state.teacher_assignments and \
-           unit_key_teacher in st.session_state.teacher_assignments[cohort_name]:
-            teacher_name = st.session_state.teacher_assignments[cohort_name][unit_key_teacher]
-        if selected_teachers and teacher_name not in selected_teachers:
-            if not (not teacher_name and "Unassigned" in selected_teachers): continue
-
-        title = f"{cohort_name}: {actual_unit_activity_display}"
-        if teacher_name: title += f" ({teacher_name})"
-        color = st.session_state.event_colors.get(get_unit_type_for_color(actual_unit_activity_display), st.session_state.event_colors["DEFAULT"])
-        
-        events.append({
-            "title": title, "start": event_py_date_obj.strftime("%Y-%m-%d"), "color": color,
-            "extendedProps": {"teacher": teacher_name, "cohort": cohort_name, "unit": actual_unit_activity_display}
-        })
-    return events
+    # Build the events column-wise instead of creating a Series per row with iterrows()
+    df_month = apply_unit_and_teacher_filters(df_month, selected_units_full, selected_teachers)
+    if df_month.empty: return events
+    unit_display, teachers = df_month['UnitDisplay'], df_month['Teacher']
+
+    # One color per unit type, gathered onto the rows through the precomputed UnitType category codes
+    default_color = st.session_state.event_colors["DEFAULT"]
+    type_categories = pd.Series(df_month['UnitType'].cat.categories)
+    category_colors = type_categories.map(st.session_state.event_colors).fillna(default_color).to_numpy(dtype=object)
+    colors = category_colors[df_month['UnitType'].cat.codes.to_numpy()]
+    events_df = pd.DataFrame({
+        "title": df_month['CohortName'].astype(str) + ": " + unit_display + (" (" + teachers + ")").where(teachers != "", ""),
+        "start": df_month['ParsedDate'].dt.strftime("%Y-%m-%d"),
+        "color": colors,
+    })
+    return [
+        {**event, "extendedProps": {"teacher": teacher, "cohort": cohort, "unit": unit}}
+        for event, teacher, cohort, unit in zip(events_df.to_dict('records'), teachers, df_month['CohortName'], unit_display)
+    ]
 
 def prepare_data_for_table_view(df_master, selected_cohorts, selected_units_full, selected_teachers, start_date_table, end_date_table):
     if df_master is None or df_master.empty: return pd.DataFrame()
@@ -217,60 +339,31 @@ def prepare_data_for_table_view(df_master, selected_cohorts, selected_units_full
         return pd.DataFrame()
 
     # Filter by selected date range
-    # Create a temporary column of Python date objects for comparison, if ParsedDate is Timestamp
-    df_master_copy = df_master.copy() # Work on a copy to avoid SettingWithCopyWarning
-    df_master_copy['ParsedDateAsDate'] = df_master_copy['ParsedDate'].dt.date
-
+    # Compare on the datetime64 column itself; the end bound is exclusive midnight after end_date_table
     try:
-        df_filtered = df_master_copy[
-            (df_master_copy['ParsedDateAsDate'] >= start_date_table) & # start_date_table is datetime.date
-            (df_master_copy['ParsedDateAsDate'] <= end_date_table)   # end_date_table is datetime.date
-        ]
+        start_ts = pd.Timestamp(start_date_table) # start_date_table is datetime.date
+        end_ts = pd.Timestamp(end_date_table) + pd.Timedelta(days=1) # end_date_table is datetime.date
+        df_filtered = df_master[(df_master['ParsedDate'] >= start_ts) & (df_master['ParsedDate'] < end_ts)]
     except Exception as e:
         st.error(f"Error filtering by date range for table view: {e}")
         return pd.DataFrame()
-    
-    # df_filtered = df_filtered.drop(columns=['ParsedDateAsDate']) # Can drop if not needed later
 
     if df_filtered.empty: return pd.DataFrame()
     df_filtered = df_filtered[df_filtered['CohortName'].isin(selected_cohorts)]
     if df_filtered.empty: return pd.DataFrame()
 
-    table_data_rows = []
-    for index, row in df_filtered.iterrows():
-        event_py_date_obj = row['ParsedDate'].date() # Use .date() for consistency
-        cohort_name = row['CohortName']
-        unit_activity_full = str(row['UnitActivity']).strip()
-        actual_unit_activity_display = unit_activity_full if unit_activity_full else "No Activity"
-
-        display_event = False # Renamed for clarity
-        if not selected_units_full: display_event = True
-        elif actual_unit_activity_display.lower() == "orientation" and "Orientation" in selected_units_full: display_event = True
-        elif actual_unit_activity_display in selected_units_full: display_event = True
-        if not display_event: continue
-
-        teacher_name = ""
-        unit_key_teacher = get_actual_unit_from_cell(actual_unit_activity_display)
-        if cohort_name in st.session_state.teacher_assignments and \
-           unit_key_teacher in st.session_state.teacher_assignments[cohort_name]:
-            teacher_name = st.session_state.teacher_assignments[cohort_name][unit_key_teacher]
-        if selected_teachers and teacher_name not in selected_teachers:
-            if not (not teacher_name and "Unassigned" in selected_teachers): continue
-
-        cell_display = actual_unit_activity_display
-        if teacher_name: cell_display += f" ({teacher_name})"
-        
-        table_data_rows.append({'Date': event_py_date_obj, 'CohortName': cohort_name, 'Activity': cell_display})
-
-    if not table_data_rows: return pd.DataFrame()
-    df_for_pivot = pd.DataFrame(table_data_rows)
-    if df_for_pivot.empty: return pd.DataFrame()
+    df_filtered = apply_unit_and_teacher_filters(df_filtered, selected_units_full, selected_teachers)
+    if df_filtered.empty: return pd.DataFrame()
+    teachers = df_filtered['Teacher']
+    df_for_pivot = pd.DataFrame({
+        'Date': df_filtered['ParsedDate'].dt.date, 'CohortName': df_filtered['CohortName'].astype(str),
+        'Activity': df_filtered['UnitDisplay'] + (" (" + teachers + ")").where(teachers != "", ""),
+    })
 
     try:
-        pivot_df = df_for_pivot.pivot_table(
-            index='Date', columns='CohortName', values='Activity',
-            aggfunc=lambda x: ' / '.join(sorted(list(set(x))))
-        ).reset_index()
+        # Dedupe and sort once up front, so each cell is a plain join instead of a set()/sorted() lambda per cell
+        df_for_pivot = df_for_pivot.drop_duplicates().sort_values('Activity')
+        pivot_df = df_for_pivot.groupby(['Date', 'CohortName'])['Activity'].agg(' / '.join).unstack('CohortName').reset_index()
     except Exception as e:
         st.error(f"Error pivoting data for table view: {e}"); return pd.DataFrame()
 
@@ -278,8 +371,55 @@ def prepare_data_for_table_view(df_master, selected_cohorts, selected_units_full
     pivot_df['Date'] = pivot_df['Date'].apply(lambda x: x.strftime('%a, %m/%d/%Y') if pd.notna(x) else '')
     return pivot_df.fillna('')
 
+@st.cache_data(show_spinner=False) # Same fingerprint key as load_master_schedule: rebuilt only when the data changes
+def get_month_row_index(file_fingerprint):
+    # {year*100 + month: positional row numbers}, so picking a month is a lookup instead of a scan
+    df = load_master_schedule(file_fingerprint)
+    return df.groupby('_ym').indices if '_ym' in df.columns else {}
+
+@st.cache_data(show_spinner=False) # Same fingerprint key as load_master_schedule: the options only change with the data
+def get_sidebar_options(file_fingerprint):
+    df = load_master_schedule(file_fingerprint)
+    all_cohort_names = df['CohortName'].cat.categories.tolist() # Categories are already sorted
+    all_unit_activities = [u for u in df['UnitActivity'].cat.categories if u and u.lower() != 'orientation']
+    min_date_ts, max_date_ts = df['ParsedDate'].min(), df['ParsedDate'].max()
+    available_year_months = []
+    if pd.notna(min_date_ts) and pd.notna(max_date_ts):
+        # Every month from the first to the last scheduled date, inclusive
+        months = pd.period_range(min_date_ts, max_date_ts, freq='M')
+        available_year_months = [(p.year, p.month) for p in months]
+    month_year_options = { f"{month_name[month]} {year}": (year, month) for year, month in available_year_months }
+    return all_cohort_names, all_unit_activities, min_date_ts, max_date_ts, available_year_months, month_year_options
+
+@st.fragment # Clicks and view switches inside the calendar component rerun only this function, not the whole page
+def render_calendar_month(df_master, file_fingerprint, month_label, selected_year, selected_month, selected_cohorts, selected_units_full, selected_teachers):
+    st.subheader(f"Schedule for {month_label}")
+    calendar_events = generate_calendar_events_from_master(
+        df_master, selected_cohorts, selected_units_full, 
+        selected_teachers, selected_year, selected_month,
+        month_rows=get_month_row_index(file_fingerprint)
+    )
+    if not calendar_events: st.info(f"No events match criteria for this month.")
+
+    calendar_options_dict = {
+        "headerToolbar": { "left": "", "center": "title", "right": "dayGridMonth,timeGridWeek" }, # Keep view switcher, title only
+        "initialView": "dayGridMonth", "height": "800px", "selectable": True,
+         "initialDate": f"{selected_year}-{selected_month:02d}-01",
+    }
+    custom_css_cal = """
+        .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.85em; line-height: 1.2; }
+        .fc-event { margin-bottom: 2px !important; padding: 1px 3px !important; border-radius: 4px; }
+    """
+    st.markdown(f"<style>{custom_css_cal}</style>", unsafe_allow_html=True)
+    # Short fixed-size key per selection; hex digests need no sanitizing
+    key_selection_cal = (selected_year, selected_month, tuple(sorted(selected_cohorts)),
+                         tuple(sorted(selected_units_full)), tuple(sorted(selected_teachers)))
+    calendar_render_key = "main_cal_view_" + hashlib.blake2b(repr(key_selection_cal).encode(), digest_size=8).hexdigest()
+    calendar_output_dict = calendar( events=calendar_events, options=calendar_options_dict, key=calendar_render_key )
+
 # --- Main Application ---
-master_schedule_df = load_master_schedule()
+master_schedule_fingerprint = get_master_schedule_fingerprint()
+master_schedule_df = load_master_schedule(master_schedule_fingerprint)
 
 # --- SIDEBAR DEFINITIONS (MUST BE HERE TO BE ACCESSIBLE BY ALL TABS) ---
 st.sidebar.title("🗓️ Filters & Controls")
@@ -294,37 +434,20 @@ if master_schedule_df is not None and not master_schedule_df.empty and \
    'ParsedDate' in master_schedule_df and pd.api.types.is_datetime64_any_dtype(master_schedule_df['ParsedDate']) and \
    not master_schedule_df['ParsedDate'].isnull().all():
 
-    all_cohort_names_master = sorted(master_schedule_df['CohortName'].astype(str).unique())
-    min_date_master_ts = master_schedule_df['ParsedDate'].min() # pandas Timestamp
-    max_date_master_ts = master_schedule_df['ParsedDate'].max() # pandas Timestamp
+    all_cohort_names_master, all_unit_activities_master, min_date_master_ts, max_date_master_ts, \
+        available_year_months, month_year_options = get_sidebar_options(master_schedule_fingerprint)
     
     min_data_py_date = min_date_master_ts.date() if pd.notna(min_date_master_ts) else date.today() - timedelta(days=365)
     max_data_py_date = max_date_master_ts.date() if pd.notna(max_date_master_ts) else date.today()
 
 
     st.sidebar.markdown("### 📅 Calendar View")
-    available_year_months = []
-    if pd.notna(min_date_master_ts) and pd.notna(max_date_master_ts):
-        min_date_py_loop = min_date_master_ts.date()
-        max_date_py_loop = max_date_master_ts.date()
-        current_loop_date_py = min_date_py_loop
-        while current_loop_date_py <= max_date_py_loop:
-            ym = (current_loop_date_py.year, current_loop_date_py.month)
-            if ym not in available_year_months: available_year_months.append(ym)
-            if current_loop_date_py.month == 12:
-                if current_loop_date_py.year + 1 > max_date_py_loop.year: break
-                current_loop_date_py = date(current_loop_date_py.year + 1, 1, 1)
-            else:
-                if current_loop_date_py.year == max_date_py_loop.year and current_loop_date_py.month + 1 > max_date_py_loop.month: break
-                current_loop_date_py = date(current_loop_date_py.year, current_loop_date_py.month + 1, 1)
-    
     if not available_year_months:
         st.sidebar.warning("No date range for calendar month selection.")
     else:
-        month_year_options = { f"{datetime(year, month, 1).strftime('%B %Y')}": (year, month) for year, month in available_year_months }
-        default_ym_str = f"{datetime(min_data_py_date.year, min_data_py_date.month, 1).strftime('%B %Y')}"
+        default_ym_str = f"{month_name[min_data_py_date.month]} {min_data_py_date.year}"
         current_dt_now = datetime.now()
-        current_month_year_now_str = f"{datetime(current_dt_now.year, current_dt_now.month, 1).strftime('%B %Y')}"
+        current_month_year_now_str = f"{month_name[current_dt_now.month]} {current_dt_now.year}"
         if current_month_year_now_str in month_year_options: default_ym_str = current_month_year_now_str
         default_index_cal = list(month_year_options.keys()).index(default_ym_str) if default_ym_str in month_year_options else 0
         
@@ -361,14 +484,12 @@ if master_schedule_df is not None and not master_schedule_df.empty and \
 
     st.sidebar.markdown("### 🎓 Common Filters")
     
-    all_unit_activities_master = sorted(master_schedule_df['UnitActivity'].astype(str).replace('nan','', regex=False).dropna().unique())
-    all_unit_activities_master = [u for u in all_unit_activities_master if u.strip() and u.lower() != 'orientation']
     units_for_global_ui = ["Orientation"] + all_unit_activities_master # Renamed for clarity
     selected_units_global = st.sidebar.multiselect(
         "Filter by Unit:", options=sorted(list(set(units_for_global_ui))), default=[],
         key="global_unit_ms"
     )
-    teacher_filter_options_global = ["Unassigned"] + sorted(list(st.session_state.all_known_teachers)) # Renamed for clarity
+    teacher_filter_options_global = ["Unassigned", *st.session_state.all_known_teachers_sorted] # Renamed for clarity
     selected_teachers_global = st.sidebar.multiselect(
         "Filter by Teacher:", options=teacher_filter_options_global, default=[],
         key="global_teacher_ms"
@@ -393,26 +514,10 @@ with tab_calendar:
         if not selected_cohorts_global:
             st.info("Please select at least one cohort in the sidebar.")
         else:
-            st.subheader(f"Schedule for {selected_month_year_str_cal}")
-            calendar_events = generate_calendar_events_from_master(
-                master_schedule_df.copy(), selected_cohorts_global, selected_units_global, 
-                selected_teachers_global, selected_year_cal, selected_month_cal
+            render_calendar_month(
+                master_schedule_df, master_schedule_fingerprint, selected_month_year_str_cal, selected_year_cal, selected_month_cal,
+                selected_cohorts_global, selected_units_global, selected_teachers_global
             )
-            if not calendar_events: st.info(f"No events match criteria for this month.")
-            
-            calendar_options_dict = {
-                "headerToolbar": { "left": "", "center": "title", "right": "dayGridMonth,timeGridWeek" }, # Keep view switcher, title only
-                "initialView": "dayGridMonth", "height": "800px", "selectable": True,
-                 "initialDate": f"{selected_year_cal}-{selected_month_cal:02d}-01",
-            }
-            custom_css_cal = """
-                .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.85em; line-height: 1.2; }
-                .fc-event { margin-bottom: 2px !important; padding: 1px 3px !important; border-radius: 4px; }
-            """
-            st.markdown(f"<style>{custom_css_cal}</style>", unsafe_allow_html=True)
-            key_suffix_cal = f"{selected_year_cal}-{selected_month_cal}-{'_'.join(sorted(selected_cohorts_global))}-{'_'.join(sorted(selected_units_global))}-{'_'.join(sorted(selected_teachers_global))}"
-            calendar_render_key = f"main_cal_v_{key_suffix_cal}".replace(" ","_").replace("(","_").replace(")","_").replace(".","_").replace("-","_").replace(":","").replace(",","")
-            calendar_output_dict = calendar( events=calendar_events, options=calendar_options_dict, key=calendar_render_key )
     else:
         st.info("Master schedule is empty or filters not set. Add data or select filters in sidebar.")
 
@@ -426,7 +531,7 @@ with tab_table_view:
         else:
             st.subheader(f"Schedule Table from {table_view_start_date_widget.strftime('%B %d, %Y')} to {table_view_end_date_widget.strftime('%B %d, %Y')}")
             table_df = prepare_data_for_table_view(
-                master_schedule_df.copy(),
+                master_schedule_df,
                 selected_cohorts_global,
                 selected_units_global,
                 selected_teachers_global,
@@ -461,7 +566,9 @@ with tab_config:
         if teacher_data_input_area_cfg:
             parsed_assignments, teachers_found = parse_teacher_assignment_data(teacher_data_input_area_cfg)
             st.session_state.teacher_assignments.update(parsed_assignments)
+            update_teacher_lookup()
             st.session_state.all_known_teachers.update(teachers_found)
+            update_known_teachers_sorted()
             config_changed_teachers_cfg = True
             st.success("Teacher assignments updated from text!")
         else: st.warning("No teacher data pasted.")
@@ -483,7 +590,7 @@ with tab_data_management:
             if not new_df.empty:
                 if append_to_master_schedule(new_df):
                     st.success(f"Added {len(new_df)} entries for '{new_df['CohortName'].iloc[0]}' to {MASTER_SCHEDULE_FILE}.")
-                    master_schedule_df = load_master_schedule() # Crucial: Reload df for current session
+                    master_schedule_df = load_master_schedule(get_master_schedule_fingerprint()) # Crucial: Reload df for current session
                 else: st.error("Failed to add data.")
             else: st.warning("No valid data parsed from input.")
         else: st.warning("No schedule data pasted.")
@@ -491,5 +598,5 @@ with tab_data_management:
     st.subheader(f"Current Master Schedule ({MASTER_SCHEDULE_FILE})")
     if not master_schedule_df.empty:
         st.caption(f"Total entries: {len(master_schedule_df)}")
-        st.dataframe(master_schedule_df.tail(100))
+        st.dataframe(master_schedule_df[['OriginalDateString', 'CohortName', 'UnitActivity', 'ParsedDate']].tail(100))
     else: st.caption(f"{MASTER_SCHEDULE_FILE} is empty or not found.")
\ No newline at end of file
@@ -1,19 +1,35 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from streamlit_calendar import calendar # Community component
 import re # For parsing unit names
+import hashlib
 
 st.set_page_config(layout="wide", page_title="FSDI/MDI Cohort & Unit Calendar")
 
+# Slot info is the part of 'Date' before the first comma, e.g. "Saturday (9 am - 12 pm), 11/23/24"
+SATURDAY_SESSION_RE = re.compile(r'^(?=[^,]*Saturday)[^,]*?\((9 am - 12 pm|12 pm - 3 pm)\)[^,]*,')
+CALENDAR_CSS = """
+    .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.8em; line-height: 1.2; }
+    .fc-event { margin-bottom: 1px !important; padding: 1px 2px !important; }
+"""
+# Above this many units the unit filter gets a search box to keep the multiselect responsive
+MAX_MULTISELECT_OPTIONS = 200
+
 # --- Helper Functions ---
-@st.cache_data # Cache the data loading
+@st.cache_data(persist="disk", show_spinner="Loading schedule…") # Cache the prepared data, also across app restarts
 def load_data(uploaded_file):
     if uploaded_file is not None:
         try:
-            # Explicitly set dtype to string for all columns during loading
-            # This helps prevent pandas from auto-interpreting numbers as floats etc.
-            df = pd.read_csv(uploaded_file, dtype=str)
+            # Explicitly set a nullable string dtype for all columns during loading
+            # This prevents numbers being read as floats and keeps blank cells as <NA> (never the string 'nan')
+            try:
+                # pyarrow's multi-threaded reader, producing Arrow-backed string columns
+                df = pd.read_csv(uploaded_file, engine='pyarrow', dtype_backend='pyarrow', dtype='string[pyarrow]')
+            except (ImportError, ValueError): # pyarrow missing or choked on the file: use the default C engine
+                uploaded_file.seek(0)
+                df = pd.read_csv(uploaded_file, dtype='string')
 
             if df.empty or 'Date' not in df.columns:
                 st.error("CSV must have a 'Date' column as the first column.")
@@ -26,110 +42,88 @@ def load_data(uploaded_file):
                 st.error("No cohort columns found (expected columns after 'Date').")
                 return None, [], []
 
-            # Extract unique unit names (e.g., FSDI 101, MDI-1 102) from the cohort columns
-            all_units = set()
+            # Extract unique unit names (e.g., FSDI 101, MDI-1 102) from all cohort cells in one pass
+            cells = pd.Series(df[cohort_cols].to_numpy(dtype=object).ravel(), dtype='string').dropna().str.strip()
+            cells = cells[(cells != '') & (cells.str.lower() != "orientation")]
+            sorted_units = sorted(cells.unique().tolist())
+            # Cells are a handful of repeated unit names, so store them as categories
+            df[cohort_cols] = df[cohort_cols].astype('category')
+            # Stripped + lowercased copy of each cohort column ("<cohort>__lc") so the
+            # Orientation checks don't re-normalize the cells on every rerun.
+            # Only the categories are normalized; the cell codes are reused, so the copy stays categorical too.
             for col in cohort_cols:
-                # Ensure the column exists and handle potential missing values correctly
-                if col in df:
-                    # Drop NA before unique, and ensure values are strings
-                    unique_values_in_col = df[col].astype(str).replace('nan', '').dropna().unique()
-                    for val in unique_values_in_col:
-                        cleaned_val = val.strip()
-                        if cleaned_val and cleaned_val.lower() != "orientation":
-                            all_units.add(cleaned_val)
-            
-            sorted_units = sorted(list(all_units))
+                lc_categories = pd.Categorical(df[col].cat.categories.astype(object).str.strip().str.lower())
+                df[f'{col}__lc'] = lc_categories.take(df[col].cat.codes.to_numpy(), allow_fill=True)
+
+            # Parse every date once here (vectorized) so reruns never re-parse
+            df['parsed_date'] = parse_dates_from_strings(df['Date'])
+            df = df.dropna(subset=['parsed_date'])
+            # A sorted DatetimeIndex turns month filtering into a slice, e.g. df.loc['2024-11':'2024-11']
+            df = df.sort_values('parsed_date', kind='stable').set_index('parsed_date', drop=False).rename_axis(None)
             return df, cohort_cols, sorted_units
         except Exception as e:
             st.error(f"Error loading CSV: {e}")
             return None, [], []
     return None, [], []
 
-def parse_date_from_string(date_str):
-    if pd.isna(date_str) or not isinstance(date_str, str): # Added check for string type
-        return None
-    try:
-        date_part = date_str.split(',')[-1].strip()
-        return datetime.strptime(date_part, "%m/%d/%y")
-    except ValueError:
-        try:
-            date_part = date_str.split(',')[-1].strip()
-            return datetime.strptime(date_part, "%m/%d/%Y")
-        except Exception:
-            return None
-
-def get_slot_info(date_str):
-    if pd.isna(date_str) or not isinstance(date_str, str): # Added check for string type
-        return ""
-    parts = date_str.split(',')
-    return parts[0].strip() if len(parts) > 1 else ""
-
-def get_actual_unit_from_cell(cell_value):
-    if pd.isna(cell_value): # Pandas uses pd.NA or None for missing after dtype=str
-        return None
-    
-    # Ensure cell_value is treated as a string
-    cell_value_str = str(cell_value).strip()
-    
-    if not cell_value_str or cell_value_str.lower() == "orientation" or cell_value_str.lower() == 'nan':
-        return None
-    return cell_value_str
-
+def parse_dates_from_strings(date_series):
+    # Date cells look like "Tuesday, 11/19/24"; only the part after the last comma is the date
+    date_part = date_series.str.rsplit(',', n=1).str[-1].str.strip()
+    parsed = pd.to_datetime(date_part, format="%m/%d/%y", errors='coerce')
+    unparsed = parsed.isna()
+    parsed[unparsed] = pd.to_datetime(date_part[unparsed], format="%m/%d/%Y", errors='coerce')
+    # Last resort for the few hand-typed ISO dates (e.g. 2024-11-19), on the leftovers only
+    unparsed = parsed.isna() & date_part.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(date_part[unparsed], format='ISO8601', errors='coerce')
+    return parsed
 
+@st.cache_data(max_entries=32, show_spinner=False) # Month/cohort/unit switches back to a seen selection hit the cache
 def generate_calendar_events(df, selected_cohorts, selected_units, selected_year, selected_month):
-    events = []
     if df is None or df.empty:
-        return events
-
-    # Ensure 'parsed_date' column exists or is created
-    if 'parsed_date' not in df.columns or df['parsed_date'].isnull().all(): # Re-parse if mostly null
-        df['parsed_date'] = df['Date'].apply(parse_date_from_string)
-        df_filtered_dates = df.dropna(subset=['parsed_date'])
-    else:
-        df_filtered_dates = df
-
-    if df_filtered_dates.empty: # Check after parsing
-        st.warning("No valid dates to process after parsing.")
-        return events
+        return []
 
-    df_month = df_filtered_dates[
-        (df_filtered_dates['parsed_date'].dt.year == selected_year) &
-        (df_filtered_dates['parsed_date'].dt.month == selected_month)
-    ]
+    # 'parsed_date' is already computed (and invalid dates dropped) in load_data
+    month_key = f"{selected_year}-{selected_month:02d}"
+    df_month = df.loc[month_key:month_key].reset_index(drop=True) # Positional index keeps rows apart after melting
+    present_cohorts = [c for c in selected_cohorts if c in df_month.columns]
+    if not present_cohorts or df_month.empty:
+        return []
 
-    for index, row in df_month.iterrows():
-        event_date = row['parsed_date']
-        date_str_full = row['Date'] # This is already a string from CSV load
-        slot_detail = get_slot_info(date_str_full)
+    # Melt to one row per (date, cohort) cell instead of looping rows x cohorts in Python.
+    # Keeping the original index and re-sorting preserves the row-by-row event order.
+    long = df_month.melt(
+        id_vars=['Date', 'parsed_date'], value_vars=present_cohorts,
+        var_name='cohort', value_name='cell', ignore_index=False
+    )
+    long['cell_lc'] = df_month[[f'{c}__lc' for c in present_cohorts]].melt(ignore_index=False)['value'].to_numpy()
+    long = long.sort_index(kind='stable')
+    long = long[long['cell'].notna()]
+    if long.empty:
+        return []
 
-        for cohort_name in selected_cohorts:
-            if cohort_name in df_month.columns and pd.notna(row[cohort_name]):
-                cell_content = str(row[cohort_name]).strip() # Ensure string for "nan" comparison
-                
-                if cell_content.lower() == 'nan': # Skip if cell content is string 'nan'
-                    continue
+    # Plain object strings: the titles are built with '+', and pyarrow has no join kernel for an all-null/empty column
+    cell = long['cell'].astype(object).str.strip()
+    if selected_units:
+        is_orientation = long['cell_lc'] == "orientation"
+        keep = (cell.isin(selected_units) & ~is_orientation) | (is_orientation & ("Orientation" in selected_units))
+        long, cell = long[keep], cell[keep]
+        if long.empty: # No session of the selected units falls in this month
+            return []
 
-                actual_unit_in_cell = get_actual_unit_from_cell(cell_content)
-
-                if not selected_units or \
-                   (actual_unit_in_cell and actual_unit_in_cell in selected_units) or \
-                   (cell_content.lower() == "orientation" and "Orientation" in selected_units):
-
-                    title = f"{cohort_name}: {cell_content}"
-                    if "Saturday" in slot_detail:
-                        if "(9 am - 12 pm)" in slot_detail:
-                            title = f"{cohort_name} (AM): {cell_content}"
-                        elif "(12 pm - 3 pm)" in slot_detail:
-                            title = f"{cohort_name} (PM): {cell_content}"
-                    
-                    events.append({
-                        "title": title,
-                        "start": event_date.strftime("%Y-%m-%d"),
-                    })
-    return events
+    # One regex pass over the slot info picks out the Saturday AM/PM sessions
+    session = long['Date'].str.extract(SATURDAY_SESSION_RE, expand=False).fillna("")
+    session_suffix = np.where(session == "9 am - 12 pm", " (AM)", np.where(session == "12 pm - 3 pm", " (PM)", ""))
+    events_df = pd.DataFrame({
+        "title": (long['cohort'] + session_suffix + ": " + cell).to_numpy(),
+        "start": long['parsed_date'].dt.strftime("%Y-%m-%d").to_numpy(),
+    })
+    return events_df.to_dict('records')
 
 # --- Streamlit App UI ---
 st.title("📅 SDGKU Unit Dashboard Calendar")
+# Styles are injected once at the top of the script instead of inside the calendar branch
+st.markdown(f"<style>{CALENDAR_CSS}</style>", unsafe_allow_html=True)
 
 uploaded_file = st.file_uploader("Upload your FSDI_corrected_schedule.csv file", type="csv")
 
@@ -138,141 +132,136 @@ df, cohort_columns, available_units = load_data(uploaded_file)
 if df is not None and not df.empty:
     st.sidebar.header("🗓️ Calendar View Options")
     
-    # --- Date Parsing and Month/Year Selection ---
-    # It's critical that 'parsed_date' is created and valid
-    if 'parsed_date' not in df.columns or df['parsed_date'].isnull().all():
-         df['parsed_date'] = df['Date'].astype(str).apply(parse_date_from_string) # Ensure Date is str
-         df = df.dropna(subset=['parsed_date'])
-
-    if df.empty or ('parsed_date' in df and df['parsed_date'].empty) or df['parsed_date'].isnull().all():
-        st.warning("No valid dates found in the uploaded CSV after parsing. Please check the 'Date' column format.")
+    # --- Month/Year Selection ---
+    # 'parsed_date' comes pre-parsed from load_data; load_data already dropped undated rows
+    # Distinct months come straight from the parsed dates as periods
+    month_periods = sorted(df['parsed_date'].dt.to_period('M').dropna().unique())
+    
+    if not month_periods:
+        st.warning("No valid dates available for month/year selection.")
     else:
-        min_date = df['parsed_date'].min()
-        available_year_months = sorted(list(set(
-            (d.year, d.month) for d in pd.to_datetime(df['parsed_date'].dropna().unique()) if pd.notna(d) # Dropna before unique
-        )))
+        month_year_options = {p.strftime('%B %Y'): (p.year, p.month) for p in month_periods}
+        default_ym_str = month_periods[0].strftime('%B %Y')
+        current_month_str = datetime.now().strftime('%B %Y')
+        if current_month_str in month_year_options:
+            default_ym_str = current_month_str
+
+        selected_month_year_str = st.sidebar.selectbox(
+            "Select Month and Year:",
+            options=list(month_year_options.keys()),
+            index=list(month_year_options.keys()).index(default_ym_str) if default_ym_str in month_year_options else 0
+        )
+        selected_year, selected_month = month_year_options[selected_month_year_str]
+
+        # --- Cohort and Unit Selection ---
+        st.sidebar.header("🎓 Filter Options")
+        if not cohort_columns:
+            st.sidebar.warning("No cohort columns available for selection.")
+            selected_cohorts = []
+        else:
+            selected_cohorts = st.sidebar.multiselect(
+                "Select Cohorts:",
+                options=cohort_columns, # These are your new column names
+                default=cohort_columns
+            )
+        
+        # available_units is already unique and sorted, so no set/sort roundtrip is needed
+        units_for_selection = list(dict.fromkeys(["Orientation"] + available_units))
         
-        if not available_year_months:
-            st.warning("No valid dates available for month/year selection.")
+        if not selected_cohorts:
+             selected_units = []
+             st.sidebar.info("Select cohorts to enable unit filtering.")
+        elif not units_for_selection:
+            st.sidebar.warning("No units found for filtering.")
+            selected_units = []
         else:
-            month_year_options = {
-                f"{datetime(year, month, 1).strftime('%B %Y')}": (year, month)
-                for year, month in available_year_months
-            }
-            current_dt = datetime.now()
-            default_ym_str = f"{datetime(min_date.year, min_date.month, 1).strftime('%B %Y')}"
-            if (current_dt.year, current_dt.month) in available_year_months:
-                current_month_str = f"{datetime(current_dt.year, current_dt.month, 1).strftime('%B %Y')}"
-                if current_month_str in month_year_options:
-                     default_ym_str = current_month_str
+            units_default = []
+            searchable_units = len(units_for_selection) > MAX_MULTISELECT_OPTIONS
+            if searchable_units:
+                # Very long option lists make the multiselect sluggish, so narrow them with a search box.
+                # Units picked under an earlier search stay listed and selected.
+                units_default = [u for u in st.session_state.get('kept_selected_units', []) if u in units_for_selection]
+                units_query = st.sidebar.text_input("Search Units/Activities:").strip().lower()
+                if units_query:
+                    units_for_selection = [u for u in units_for_selection if u in units_default or units_query in u.lower()]
 
-            selected_month_year_str = st.sidebar.selectbox(
-                "Select Month and Year:",
-                options=list(month_year_options.keys()),
-                index=list(month_year_options.keys()).index(default_ym_str) if default_ym_str in month_year_options else 0
+            selected_units = st.sidebar.multiselect(
+                "Select Units/Activities (leave empty to show all for selected cohorts):",
+                options=units_for_selection,
+                default=units_default
             )
-            selected_year, selected_month = month_year_options[selected_month_year_str]
+            if searchable_units:
+                st.session_state.kept_selected_units = selected_units
 
-            # --- Cohort and Unit Selection ---
-            st.sidebar.header("🎓 Filter Options")
-            if not cohort_columns:
-                st.sidebar.warning("No cohort columns available for selection.")
-                selected_cohorts = []
-            else:
-                selected_cohorts = st.sidebar.multiselect(
-                    "Select Cohorts:",
-                    options=cohort_columns, # These are your new column names
-                    default=cohort_columns
-                )
+        # --- Calendar Display ---
+        if not selected_cohorts:
+            st.info("Please select at least one cohort to display data.")
+        else:
+            st.subheader(f"Schedule for {selected_month_year_str}")
             
-            units_for_selection = ["Orientation"] + available_units
+            calendar_events = generate_calendar_events(df, selected_cohorts, selected_units, selected_year, selected_month)
+
+            if not calendar_events:
+                if selected_units:
+                     st.info(f"No events scheduled for the selected cohorts AND units in this month.")
+                else:
+                     st.info(f"No events scheduled for the selected cohorts in this month.")
+            
+            calendar_options = {
+                "headerToolbar": { "left": "", "center": "title", "right": "" },
+                "initialView": "dayGridMonth",
+                "initialDate": f"{selected_year}-{selected_month:02d}-01",
+                "height": "700px",
+            }
             
-            if not selected_cohorts:
-                 selected_units = []
-                 st.sidebar.info("Select cohorts to enable unit filtering.")
-            elif not units_for_selection:
-                st.sidebar.warning("No units found for filtering.")
-                selected_units = []
-            else:
-                selected_units = st.sidebar.multiselect(
-                    "Select Units/Activities (leave empty to show all for selected cohorts):",
-                    options=sorted(list(set(units_for_selection))),
-                    default=[]
-                )
+            # Short fixed-size key: the same selection keeps the calendar component mounted
+            calendar_key_sig = hashlib.blake2b(
+                repr((selected_year, selected_month, tuple(sorted(selected_cohorts)), tuple(sorted(selected_units)))).encode(),
+                digest_size=8
+            ).hexdigest()
+            calendar_key = f"cal-{calendar_key_sig}"
 
-            # --- Calendar Display ---
-            if not selected_cohorts:
-                st.info("Please select at least one cohort to display data.")
-            else:
-                st.subheader(f"Schedule for {selected_month_year_str}")
-                
-                calendar_events = generate_calendar_events(df.copy(), selected_cohorts, selected_units, selected_year, selected_month)
+            calendar_widget = calendar(
+                events=calendar_events,
+                options=calendar_options,
+                key=calendar_key 
+            )
+            
+            # --- Raw Data Expander ---
+            with st.expander("Show Raw Data for Selected Month, Cohorts, and Units"):
+                # Filter df for the current month first
+                month_key = f"{selected_year}-{selected_month:02d}"
+                df_current_month_view = df.loc[month_key:month_key] # Read-only slice, no copy needed
 
-                if not calendar_events:
+                if not df_current_month_view.empty:
+                    shown_cohorts = [c for c in selected_cohorts if c in df_current_month_view.columns]
+                    display_cols_raw = ['Date'] + shown_cohorts
                     if selected_units:
-                         st.info(f"No events scheduled for the selected cohorts AND units in this month.")
-                    else:
-                         st.info(f"No events scheduled for the selected cohorts in this month.")
-                
-                calendar_options = {
-                    "headerToolbar": { "left": "", "center": "title", "right": "" },
-                    "initialView": "dayGridMonth",
-                    "initialDate": f"{selected_year}-{selected_month:02d}-01",
-                    "height": "700px",
-                }
-                
-                custom_css = """
-                    .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.8em; line-height: 1.2; }
-                    .fc-event { margin-bottom: 1px !important; padding: 1px 2px !important; }
-                """
-                st.markdown(f"<style>{custom_css}</style>", unsafe_allow_html=True)
-
-                calendar_key_parts = [
-                    f"cal-{selected_year}-{selected_month}",
-                    "cohorts-" + "_".join(sorted(selected_cohorts)).replace(" ","_").replace("(","_").replace(")","_"), # Sanitize key
-                    "units-" + "_".join(sorted(selected_units)).replace(" ","_") # Sanitize key
-                ]
-                calendar_key = "-".join(calendar_key_parts)
-
-                calendar_widget = calendar(
-                    events=calendar_events,
-                    options=calendar_options,
-                    key=calendar_key 
-                )
-                
-                # --- Raw Data Expander ---
-                with st.expander("Show Raw Data for Selected Month, Cohorts, and Units"):
-                    # Filter df for the current month first
-                    df_current_month_view = df[
-                        (df['parsed_date'].dt.year == selected_year) &
-                        (df['parsed_date'].dt.month == selected_month)
-                    ].copy() # Use a copy to avoid SettingWithCopyWarning
+                        # Create a boolean mask for rows to keep
+                        # Row should be kept if ANY of the selected cohort columns for that row
+                        # contain one of the selected units (or is Orientation).
+                        # All selected cohort cells are stacked and checked in one pass, then
+                        # collapsed back to one flag per row.
+                        # (stacked on row positions: the date index repeats for split Saturday slots)
+                        month_cells = df_current_month_view.reset_index(drop=True)
+                        cells = month_cells[shown_cohorts].stack(future_stack=True).str.strip()
+                        cells_lc = month_cells[[f'{c}__lc' for c in shown_cohorts]].stack(future_stack=True).to_numpy(dtype=object) # NaN for blanks
+                        is_orientation = (cells_lc == "orientation") & ("Orientation" in selected_units)
+                        is_selected_unit = cells.isin([u for u in selected_units if u.lower() != "orientation"]).to_numpy()
+                        mask = pd.Series(is_orientation | is_selected_unit, index=cells.index).groupby(level=0).any()
+                        mask = mask.reindex(month_cells.index, fill_value=False).to_numpy()
 
-                    if not df_current_month_view.empty:
-                        if selected_units:
-                            # Create a boolean mask for rows to keep
-                            # Row should be kept if ANY of the selected cohort columns for that row
-                            # contain one of the selected units (or is Orientation).
-                            mask = pd.Series([False] * len(df_current_month_view), index=df_current_month_view.index)
-                            for cohort_col_iter in selected_cohorts:
-                                if cohort_col_iter in df_current_month_view:
-                                    # Check for Orientation
-                                    is_orientation = (df_current_month_view[cohort_col_iter].astype(str).str.lower() == "orientation") & ("Orientation" in selected_units)
-                                    # Check for other selected units
-                                    is_selected_unit = df_current_month_view[cohort_col_iter].astype(str).isin([u for u in selected_units if u.lower() != "orientation"])
-                                    mask |= (is_orientation | is_selected_unit)
-                            
-                            df_display_filtered_by_unit = df_current_month_view[mask]
-                            
-                            display_cols_raw = ['Date'] + [col for col in selected_cohorts if col in df_display_filtered_by_unit.columns]
-                            st.dataframe(df_display_filtered_by_unit[display_cols_raw].dropna(subset=[col for col in selected_cohorts if col in df_display_filtered_by_unit.columns], how='all'))
+                        # A matching cell is never empty, so these rows need no extra dropna
+                        st.dataframe(df_current_month_view.loc[mask, display_cols_raw], hide_index=True)
 
-                        else: # No unit filter, show all for selected cohorts from the month's view
-                            display_cols_raw = ['Date'] + [col for col in selected_cohorts if col in df_current_month_view.columns]
-                            st.dataframe(df_current_month_view[display_cols_raw].dropna(subset=[col for col in selected_cohorts if col in df_current_month_view.columns], how='all'))
-                    else:
-                        st.write("No data for this month to display.")
+                    else: # No unit filter, show all rows that have something in a selected cohort
+                        has_shown_cohort = df_current_month_view[shown_cohorts].notna().to_numpy().any(axis=1)
+                        st.dataframe(df_current_month_view.loc[has_shown_cohort, display_cols_raw], hide_index=True)
+                else:
+                    st.write("No data for this month to display.")
 
 else:
     if uploaded_file is None:
-        st.info("👈 Please upload the CSV file to begin.")
\ No newline at end of file
+        st.info("👈 Please upload the CSV file to begin.")
+    elif df is not None:
+        st.warning("No valid dates found in the uploaded CSV after parsing. Please check the 'Date' column format.")
\ No newline at end of file
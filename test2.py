@@ -1,12 +1,42 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from streamlit_calendar import calendar
 import re
 import json # For potential config saving/loading
+import hashlib
 
 st.set_page_config(layout="wide", page_title="Cohort & Unit Calendar")
 
+# Patterns used by the parsers, compiled once at import
+SLOT_INFO_RE = re.compile(r'^([^,]*),') # Slot part of a 'Date' cell, e.g. "Saturday (9 am - 12 pm)"
+UNIT_NUMBER_RE = re.compile(r'\b(\d{3})\b') # 3-digit unit number inside a unit name, e.g. "FSDI 101"
+UNIT_LINE_RE = re.compile(r'^\d{3}\s') # teacher-assignment line starting with a unit number
+LEADING_NUMBER_RE = re.compile(r'(\d+)')
+WHITESPACE_SPLIT_RE = re.compile(r'\s+|\t')
+
+CALENDAR_CSS = """
+    .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.85em; line-height: 1.2; }
+    .fc-event { margin-bottom: 2px !important; padding: 1px 3px !important; border-radius: 4px; }
+    .fc-timegrid-event .fc-event-main { font-size: 0.75em; } /* Smaller font for timegrid events */
+"""
+# Calendar options that don't depend on the selection; only 'initialDate' is added per month
+CALENDAR_BASE_OPTIONS = {
+    "headerToolbar": { "left": "", "center": "title", "right": "dayGridMonth,timeGridWeek" }, # Added week view
+    "initialView": "dayGridMonth",
+    "height": "800px",
+    "eventTimeFormat": { # For week view
+        'hour': 'numeric',
+        'minute': '2-digit',
+        'meridiem': 'short'
+    },
+    "slotMinTime": "08:00:00",
+    "slotMaxTime": "22:00:00",
+    "selectable": True, # Allows clicking on days/slots
+    # "eventClick": # Could add JS callback for event clicks
+}
+
 # --- Initialize Session State for Configuration ---
 if 'event_colors' not in st.session_state:
     st.session_state.event_colors = {
@@ -23,7 +53,7 @@ if 'all_known_teachers' not in st.session_state:
 
 
 # --- Helper Functions ---
-@st.cache_data
+@st.cache_data(persist="disk", show_spinner="Loading schedule…") # Keyed on the file's bytes; also survives app restarts
 def load_schedule_data(uploaded_file):
     if uploaded_file is not None:
         try:
@@ -37,62 +67,73 @@ def load_schedule_data(uploaded_file):
                 st.error("No cohort columns found in schedule CSV.")
                 return None, [], []
 
-            all_units = set()
+            # Unique unit names across all cohort columns in one pass (dtype=str gives str cells; blanks are NaN)
+            cells = pd.Series(df[cohort_cols].to_numpy(dtype=object).ravel(), dtype=object).dropna().str.strip()
+            cells = cells[(cells != '') & (cells.str.lower() != "orientation")]
+            sorted_units = sorted(cells.unique().tolist())
+            # Parse every date and slot once here (vectorized), so reruns and filter changes never re-parse.
+            # Rows whose date doesn't parse keep NaT; the calendar tab drops them.
+            df['parsed_date'] = parse_dates_from_strings(df['Date'])
+            df['slot_info'] = df['Date'].str.extract(SLOT_INFO_RE, expand=False).str.strip().fillna("") # e.g. "Saturday (9 am - 12 pm)"
+            df['slot_suffix'] = get_slot_suffixes(df['slot_info']) # Title suffix per row, e.g. " (Sat AM)"
+            # yyyymm as one int (0 for NaT), so month filters are a single compare instead of .dt.year and .dt.month
+            df['year_month'] = (df['parsed_date'].dt.year * 100 + df['parsed_date'].dt.month).fillna(0).astype('int32')
+            # Teacher unit key and color type per cell, as companion columns "<cohort>__unit_key" / "<cohort>__color_type",
+            # so filter changes never run the regex or the substring checks again
             for col in cohort_cols:
-                if col in df:
-                    unique_values_in_col = df[col].astype(str).replace('nan', '').dropna().unique()
-                    for val in unique_values_in_col:
-                        cleaned_val = val.strip()
-                        if cleaned_val and cleaned_val.lower() != "orientation":
-                            all_units.add(cleaned_val)
-            
-            sorted_units = sorted(list(all_units))
+                df[f'{col}__unit_key'] = get_actual_units_from_cells(df[col])
+                df[f'{col}__color_type'] = get_unit_types_for_color(df[col])
+            # Cells are a handful of repeated unit names, so store them (and their companions) as categories
+            derived_cols = [f'{col}__{suffix}' for col in cohort_cols for suffix in ('unit_key', 'color_type')]
+            df[cohort_cols + derived_cols] = df[cohort_cols + derived_cols].astype('category')
             return df, cohort_cols, sorted_units
         except Exception as e:
             st.error(f"Error loading schedule CSV: {e}")
             return None, [], []
     return None, [], []
 
-def parse_date_from_string(date_str):
-    if pd.isna(date_str) or not isinstance(date_str, str):
-        return None
-    try:
-        date_part = date_str.split(',')[-1].strip()
-        return datetime.strptime(date_part, "%m/%d/%y")
-    except ValueError:
-        try:
-            date_part = date_str.split(',')[-1].strip()
-            return datetime.strptime(date_part, "%m/%d/%Y")
-        except Exception:
-            return None
-
-def get_slot_info(date_str):
-    if pd.isna(date_str) or not isinstance(date_str, str):
-        return ""
-    parts = date_str.split(',')
-    return parts[0].strip() if len(parts) > 1 else ""
-
-def get_actual_unit_from_cell(cell_value):
-    if pd.isna(cell_value): return None
-    cell_value_str = str(cell_value).strip()
-    if not cell_value_str or cell_value_str.lower() == "orientation" or cell_value_str.lower() == 'nan':
-        return None
+def parse_dates_from_strings(date_series):
+    # Date cells look like "Tuesday, 11/19/24"; only the part after the last comma is the date
+    date_part = date_series.str.rsplit(',', n=1).str[-1].str.strip()
+    parsed = pd.to_datetime(date_part, format="%m/%d/%y", errors='coerce')
+    unparsed = parsed.isna()
+    parsed[unparsed] = pd.to_datetime(date_part[unparsed], format="%m/%d/%Y", errors='coerce')
+    return parsed
+
+def get_slot_suffixes(slot_info):
+    # Saturday sessions get an AM/PM tag in the event title; every other day gets no suffix
+    saturday_slot = np.where(
+        slot_info.str.contains("(9 am - 12 pm)", regex=False), " (Sat AM)",
+        np.where(slot_info.str.contains("(12 pm - 3 pm)", regex=False), " (Sat PM)", " (Sat)")
+    )
+    return np.where(slot_info.str.contains("Saturday", regex=False), saturday_slot, "")
+
+def get_actual_units_from_cells(cell_values):
     # Extract the unit number if present (e.g., "101" from "FSDI 101")
     # This helps in matching with teacher assignment keys which are just numbers
-    match = re.search(r'\b(\d{3})\b', cell_value_str) # Looks for 3 digits
-    if match:
-        return match.group(1) # Returns "101", "102", etc.
-    return cell_value_str # Fallback to full name if no number found
+    cells = pd.Series(cell_values, dtype=object).fillna('').astype(str).str.strip()
+    unit_keys = cells.str.extract(UNIT_NUMBER_RE, expand=False).fillna(cells) # Fallback to full name if no number found
+    return unit_keys.where((cells != '') & ~cells.str.lower().isin(["orientation", "nan"]), None)
+
+
+def get_unit_types_for_color(unit_names):
+    # Vectorized FSDI/MDI1/MDI2/ORIENTATION/DEFAULT classification; earlier conditions win, like the old if-chain
+    upper_names = pd.Series(unit_names, dtype=object).fillna('').astype(str).str.upper()
+    conditions = [
+        upper_names.str.contains("FSDI", regex=False),
+        upper_names.str.contains("MDI1|MDI-1"), # Handle both MDI1 and MDI-1
+        upper_names.str.contains("MDI2|MDI-2"),
+        upper_names.str.contains("ORIENTATION", regex=False),
+    ]
+    return np.select(conditions, ["FSDI", "MDI1", "MDI2", "ORIENTATION"], default="DEFAULT")
 
 
-def get_unit_type_for_color(unit_name_full):
-    if pd.isna(unit_name_full) or not unit_name_full: return "DEFAULT"
-    unit_name_upper = str(unit_name_full).upper()
-    if "FSDI" in unit_name_upper: return "FSDI"
-    if "MDI1" in unit_name_upper or "MDI-1" in unit_name_upper: return "MDI1" # Handle both MDI1 and MDI-1
-    if "MDI2" in unit_name_upper or "MDI-2" in unit_name_upper: return "MDI2"
-    if "ORIENTATION" in unit_name_upper: return "ORIENTATION"
-    return "DEFAULT"
+def update_teacher_lookup():
+    # Flat (cohort, unit_key) -> teacher view of teacher_assignments; rebuild whenever the assignments change
+    st.session_state.teacher_lookup = {
+        (cohort, unit): teacher
+        for cohort, units in st.session_state.teacher_assignments.items() for unit, teacher in units.items()
+    }
 
 
 def parse_teacher_assignment_data(raw_data):
@@ -104,113 +145,92 @@ def parse_teacher_assignment_data(raw_data):
         line = line.strip()
         if not line:
             continue
+        has_tab = "\t" in line
 
         # Check if the line is a cohort header (e.g., "Cohort 52", "FSDI Ch 54")
         # Make this flexible to match typical cohort naming conventions.
-        # Using a more robust regex could be an improvement.
-        # For now, checking for "Cohort" or "Ch" (common in your examples)
-        if (line.upper().startswith("COHORT ") or "CH " in line.upper() or "Ch " in line) and not "\t" in line and not re.match(r"^\d{3}\s", line):
+        # For now, checking for "Cohort" or "Ch" (common in your examples); "Ch " is covered by the uppercase check
+        line_upper = line.upper()
+        if (line_upper.startswith("COHORT ") or "CH " in line_upper) and not has_tab and not UNIT_LINE_RE.match(line):
             current_cohort = line
             assignments[current_cohort] = {}
-        elif current_cohort and ("\t" in line or len(line.split()) == 2): # Assuming unit and teacher are tab or space separated
-            parts = re.split(r'\s+|\t', line, 1) # Split by any whitespace, max 1 split
-            if len(parts) == 2:
+        elif current_cohort:
+            parts = WHITESPACE_SPLIT_RE.split(line, maxsplit=1) # Split by any whitespace, max 1 split
+            # Assuming unit and teacher are tab separated, or exactly two space-separated words
+            if len(parts) == 2 and (has_tab or len(parts[1].split()) == 1):
                 unit, teacher = parts[0].strip(), parts[1].strip()
                 if unit and teacher:
                     # Store unit as the number part if possible, for easier matching
-                    unit_key = unit # Default to what's parsed
-                    match_unit_num = re.match(r'(\d+)', unit) # Match digits at start of unit
-                    if match_unit_num:
-                        unit_key = match_unit_num.group(1)
+                    match_unit_num = LEADING_NUMBER_RE.match(unit) # Match digits at start of unit
+                    unit_key = match_unit_num.group(1) if match_unit_num else unit
 
                     assignments[current_cohort][unit_key] = teacher
                     teachers_found.add(teacher)
     return assignments, teachers_found
 
 
-def generate_calendar_events(df_schedule, selected_cohorts, selected_units_full_names, selected_teachers, selected_year, selected_month):
+@st.cache_data(max_entries=32, show_spinner=False) # Reruns with the same filters, teachers and colors hit the cache
+def generate_calendar_events(df_schedule, selected_cohorts, selected_units_full_names, selected_teachers, selected_year, selected_month, teacher_lookup, event_colors):
     events = []
     if df_schedule is None or df_schedule.empty: return events
 
-    df = df_schedule.copy() # Work on a copy
-
-    if 'parsed_date' not in df.columns or df['parsed_date'].isnull().all():
-        df['parsed_date'] = df['Date'].apply(parse_date_from_string)
-        df = df.dropna(subset=['parsed_date'])
-
-    if df.empty: return events
-
-    df_month = df[
-        (df['parsed_date'].dt.year == selected_year) &
-        (df['parsed_date'].dt.month == selected_month)
+    # 'parsed_date', 'slot_suffix' and 'year_month' come from load_schedule_data; NaT rows never match the month
+    in_month = df_schedule['year_month'] == selected_year * 100 + selected_month
+    present_cohorts = [c for c in selected_cohorts if c in df_schedule.columns] # cohort names are like "FSDI Ch 54"
+    if not in_month.any() or not present_cohorts: return events
+
+    # Only the month's rows and the columns the events need, no full copy of the schedule
+    companion_cols = [f'{c}__{suffix}' for suffix in ('unit_key', 'color_type') for c in present_cohorts]
+    df_month = df_schedule.loc[in_month, ['parsed_date', 'slot_suffix'] + present_cohorts + companion_cols]
+
+    # Melt to one row per (date, cohort) cell instead of looping rows x cohorts in Python.
+    # Keeping the original index and re-sorting preserves the row-by-row event order.
+    long = df_month.melt(
+        id_vars=['parsed_date', 'slot_suffix'], value_vars=present_cohorts,
+        var_name='cohort', value_name='cell', ignore_index=False
+    )
+    for suffix in ['unit_key', 'color_type']: # Precomputed in load_schedule_data, melted in the same column order
+        long[suffix] = df_month[[f'{c}__{suffix}' for c in present_cohorts]].melt(ignore_index=False)['value'].to_numpy()
+    long = long.sort_index(kind='stable').reset_index(drop=True)
+    long = long[long['cell'].notna()]
+    cell = long['cell'].astype(str).str.strip() # Full unit name, e.g. "FSDI 101"
+    not_nan_text = cell.str.lower() != 'nan'
+    long, cell = long[not_nan_text], cell[not_nan_text]
+
+    # --- Unit Filtering ---
+    # selected_units_full_names contains full names like "FSDI 101"
+    if selected_units_full_names: # No unit filter selected = show every unit
+        is_orientation = cell.str.lower() == "orientation"
+        keep = cell.isin(selected_units_full_names) | (is_orientation & ("Orientation" in selected_units_full_names))
+        long, cell = long[keep], cell[keep]
+    if long.empty: return events
+
+    # --- Teacher Assignment and Filtering ---
+    # Unit keys are "101", or the full name if there is no number; cohort keys must match the CSV header exactly
+    teachers = pd.Series(
+        [teacher_lookup.get(key, "") for key in zip(long['cohort'], long['unit_key'])], index=long.index, dtype=object
+    )
+    if selected_teachers: # Show unassigned if "Unassigned" is selected
+        keep = teachers.isin(selected_teachers) | ((teachers == "") & ("Unassigned" in selected_teachers))
+        long, cell, teachers = long[keep], cell[keep], teachers[keep]
+        if long.empty: return events
+
+    # --- Event Title and Color ---
+    colors = long['color_type'].map(event_colors).fillna(event_colors["DEFAULT"])
+    # "<cohort>: <unit>[ (<teacher>)][ (Sat AM|Sat PM|Sat)]", concatenated in one str.cat pass
+    teacher_part = (" (" + teachers + ")").where(teachers != "", "")
+    titles = (long['cohort'] + ": ").str.cat([cell, teacher_part, long['slot_suffix']])
+    starts = long['parsed_date'].dt.strftime("%Y-%m-%d") # One vectorized format for all events
+    return [
+        {"title": title, "start": start, "color": color, "extendedProps": {"teacher": teacher, "cohort": cohort, "unit": unit}}
+        for title, start, color, teacher, cohort, unit in zip(titles, starts, colors, teachers, long['cohort'], cell)
     ]
 
-    for index, row in df_month.iterrows():
-        event_date = row['parsed_date']
-        date_str_full = row['Date']
-        slot_detail = get_slot_info(date_str_full)
-
-        for cohort_name_sched in selected_cohorts: # cohort_name_sched is like "FSDI Ch 54"
-            if cohort_name_sched in df_month.columns and pd.notna(row[cohort_name_sched]):
-                cell_content_full = str(row[cohort_name_sched]).strip() # Full unit name, e.g. "FSDI 101"
-                if cell_content_full.lower() == 'nan': continue
-
-                unit_key_for_teacher = get_actual_unit_from_cell(cell_content_full) # "101" or full if no number
-                
-                # --- Unit Filtering ---
-                # selected_units_full_names contains full names like "FSDI 101"
-                display_event_based_on_unit = False
-                if not selected_units_full_names: # No unit filter selected
-                    display_event_based_on_unit = True
-                elif cell_content_full.lower() == "orientation" and "Orientation" in selected_units_full_names:
-                    display_event_based_on_unit = True
-                elif cell_content_full in selected_units_full_names:
-                    display_event_based_on_unit = True
-                
-                if not display_event_based_on_unit:
-                    continue # Skip if unit filter doesn't match
-
-                # --- Teacher Assignment and Filtering ---
-                teacher_name = ""
-                # Find cohort key in teacher_assignments (match "FSDI Ch 54" with "FSDI Ch 54")
-                cohort_key_for_teacher_assignment = cohort_name_sched # Assume exact match for now
-                
-                if cohort_key_for_teacher_assignment in st.session_state.teacher_assignments and \
-                   unit_key_for_teacher in st.session_state.teacher_assignments[cohort_key_for_teacher_assignment]:
-                    teacher_name = st.session_state.teacher_assignments[cohort_key_for_teacher_assignment][unit_key_for_teacher]
-
-                if selected_teachers and teacher_name not in selected_teachers:
-                    if not (not teacher_name and "Unassigned" in selected_teachers): # Show unassigned if "Unassigned" is selected
-                         continue # Skip if teacher filter doesn't match
-
-                # --- Event Title and Color ---
-                title_parts = [cohort_name_sched, cell_content_full]
-                if teacher_name:
-                    title_parts.append(f"({teacher_name})")
-                
-                title = ": ".join(title_parts[:2]) # Cohort: Unit
-                if len(title_parts) > 2: # Add teacher if present
-                    title += f" {title_parts[2]}"
-
-                if "Saturday" in slot_detail:
-                    time_slot = " (Sat)"
-                    if "(9 am - 12 pm)" in slot_detail: time_slot = " (Sat AM)"
-                    elif "(12 pm - 3 pm)" in slot_detail: time_slot = " (Sat PM)"
-                    title += time_slot
-
-                event_type_for_color = get_unit_type_for_color(cell_content_full)
-                color = st.session_state.event_colors.get(event_type_for_color, st.session_state.event_colors["DEFAULT"])
-                
-                events.append({
-                    "title": title,
-                    "start": event_date.strftime("%Y-%m-%d"),
-                    "color": color,
-                    "extendedProps": {"teacher": teacher_name, "cohort": cohort_name_sched, "unit": cell_content_full}
-                })
-    return events
-
 
 # --- Main Application ---
+if 'teacher_lookup' not in st.session_state:
+    update_teacher_lookup()
+
 st.sidebar.title("📅 Calendar Navigation")
 schedule_file = st.sidebar.file_uploader("Upload Schedule CSV", type="csv", key="schedule_csv")
 df_schedule, cohort_columns_from_csv, available_units_from_csv = load_schedule_data(schedule_file)
@@ -251,6 +271,7 @@ with tab2:
         if teacher_data_input:
             parsed_assignments, teachers_found = parse_teacher_assignment_data(teacher_data_input)
             st.session_state.teacher_assignments.update(parsed_assignments) # Merge with existing
+            update_teacher_lookup()
             st.session_state.all_known_teachers.update(teachers_found)
             st.success("Teacher assignments updated!")
             # st.experimental_rerun()
@@ -268,18 +289,16 @@ with tab1:
     st.title("📅 Cohort & Unit Dashboard Calendar")
 
     if df_schedule is not None and not df_schedule.empty:
-        # --- Date Parsing and Month/Year Selection ---
-        if 'parsed_date' not in df_schedule.columns or df_schedule['parsed_date'].isnull().all():
-            df_schedule['parsed_date'] = df_schedule['Date'].astype(str).apply(parse_date_from_string)
-            df_schedule = df_schedule.dropna(subset=['parsed_date'])
+        # --- Month/Year Selection ---
+        # 'parsed_date' comes pre-parsed from load_schedule_data; only rows with a valid date are used
+        df_schedule = df_schedule.dropna(subset=['parsed_date'])
 
         if df_schedule.empty or df_schedule['parsed_date'].isnull().all():
             st.warning("No valid dates in schedule CSV after parsing.")
         else:
             min_date = df_schedule['parsed_date'].min()
-            available_year_months = sorted(list(set(
-                (d.year, d.month) for d in pd.to_datetime(df_schedule['parsed_date'].dropna().unique()) if pd.notna(d)
-            )))
+            # Distinct months from the precomputed yyyymm ints; the Python loop only sees one value per month
+            available_year_months = [divmod(int(ym), 100) for ym in np.sort(df_schedule['year_month'].unique())]
             
             if not available_year_months:
                 st.warning("No valid dates available for month/year selection.")
@@ -329,37 +348,21 @@ with tab1:
                     
                     calendar_events = generate_calendar_events(
                         df_schedule, selected_cohorts, selected_units_display, 
-                        selected_teachers_filter, selected_year, selected_month
+                        selected_teachers_filter, selected_year, selected_month,
+                        st.session_state.teacher_lookup, st.session_state.event_colors
                     )
 
                     if not calendar_events:
                         st.info(f"No events match the current filter criteria for this month.")
                     
-                    calendar_options = {
-                        "headerToolbar": { "left": "", "center": "title", "right": "dayGridMonth,timeGridWeek" }, # Added week view
-                        "initialView": "dayGridMonth",
-                        "initialDate": f"{selected_year}-{selected_month:02d}-01",
-                        "height": "800px",
-                        "eventTimeFormat": { # For week view
-                            'hour': 'numeric',
-                            'minute': '2-digit',
-                            'meridiem': 'short'
-                        },
-                        "slotMinTime": "08:00:00",
-                        "slotMaxTime": "22:00:00",
-                        "selectable": True, # Allows clicking on days/slots
-                        # "eventClick": # Could add JS callback for event clicks
-                    }
-                    
-                    custom_css = """
-                        .fc-event-main { white-space: normal !important; overflow: hidden; text-overflow: ellipsis; font-size: 0.85em; line-height: 1.2; }
-                        .fc-event { margin-bottom: 2px !important; padding: 1px 3px !important; border-radius: 4px; }
-                        .fc-timegrid-event .fc-event-main { font-size: 0.75em; } /* Smaller font for timegrid events */
-                    """
-                    st.markdown(f"<style>{custom_css}</style>", unsafe_allow_html=True)
+                    calendar_options = {**CALENDAR_BASE_OPTIONS, "initialDate": f"{selected_year}-{selected_month:02d}-01"}
+                    # Re-emitted every run: Streamlit drops elements a rerun doesn't write again
+                    st.markdown(f"<style>{CALENDAR_CSS}</style>", unsafe_allow_html=True)
 
-                    key_suffix = f"{selected_year}-{selected_month}-{'_'.join(sorted(selected_cohorts))}-{'_'.join(sorted(selected_units_display))}-{'_'.join(sorted(selected_teachers_filter))}"
-                    calendar_key = f"main_calendar_{key_suffix}".replace(" ","_").replace("(","_").replace(")","_").replace(".","_").replace("-","_")
+                    # Short fixed-size key per selection; hex digests need no sanitizing
+                    key_selection = (selected_year, selected_month, tuple(sorted(selected_cohorts)),
+                                     tuple(sorted(selected_units_display)), tuple(sorted(selected_teachers_filter)))
+                    calendar_key = "main_calendar_" + hashlib.blake2b(repr(key_selection).encode(), digest_size=8).hexdigest()
 
 
                     calendar_output = calendar( events=calendar_events, options=calendar_options, key=calendar_key )
@@ -369,11 +372,9 @@ with tab1:
                     # For now, raw data will NOT reflect teacher or deep unit filtering easily without complex melts
                     # It will show based on selected cohorts and month.
                     with st.expander("Show Raw Schedule Data for Selected Month & Cohorts"):
-                        df_display_month_cohort = df_schedule[
-                            (df_schedule['parsed_date'].dt.year == selected_year) &
-                            (df_schedule['parsed_date'].dt.month == selected_month)
-                        ]
-                        cols_to_show = ['Date'] + [c for c in selected_cohorts if c in df_display_month_cohort.columns]
-                        st.dataframe(df_display_month_cohort[cols_to_show].dropna(subset=[c for c in selected_cohorts if c in df_display_month_cohort.columns], how='all'))
+                        df_display_month_cohort = df_schedule[df_schedule['year_month'] == selected_year * 100 + selected_month]
+                        cohort_cols_present = [c for c in selected_cohorts if c in df_display_month_cohort.columns]
+                        has_any_cohort = df_display_month_cohort[cohort_cols_present].notna().to_numpy().any(axis=1) # Rows with at least one selected cohort cell
+                        st.dataframe(df_display_month_cohort.loc[has_any_cohort, ['Date'] + cohort_cols_present])
     else:
         st.info("👈 Please upload the Schedule CSV file in the sidebar to begin.")
\ No newline at end of file